@@ -1,9 +1,9 @@
 import yaml
 import os
-import time
 import sys
 import threading
 import logging
+import numpy as np
 from recorder import AudioRecorder
 from transcriber import Transcriber
 from keyboard_handler import KeyboardHandler
@@ -21,22 +21,27 @@ logger = logging.getLogger(__name__)
 class LocalWhisperCLI:
     def __init__(self, config_path="config.yaml"):
         self.config = self._load_config(config_path)
-        self.recorder = AudioRecorder()
+
+        # Initialize silence filter with config; the recorder feeds it
+        # incrementally during recording
+        silence_filter_config = self.config.get("silence_filter", {})
+        self.silence_filter = SilenceFilter(config=silence_filter_config)
+
+        self.recorder = AudioRecorder(silence_filter=self.silence_filter)
         self.transcriber = Transcriber(
             model_size=self.config.get("model_size", "turbo"),
             device=self.config.get("device"),
+            compute_type=self.config.get("compute_type"),
             transcription_config=self.config.get("transcription", {})
         )
+        self._stop_event = threading.Event()
         self.keyboard = KeyboardHandler(
             hotkey_name=self.config.get("hotkey", "caps_lock"),
-            on_toggle_callback=self.toggle_recording
+            on_toggle_callback=self.toggle_recording,
+            on_stop_callback=self._stop_event.set
         )
         self.is_recording = False
-        
-        # Initialize silence filter with config
-        silence_filter_config = self.config.get("silence_filter", {})
-        self.silence_filter = SilenceFilter(config=silence_filter_config)
-        
+
         # Get minimum recording duration
         self.min_recording_duration_sec = silence_filter_config.get(
             "min_recording_duration_sec", 0.5
@@ -64,8 +69,11 @@ class LocalWhisperCLI:
         else:
             self.is_recording = False
             audio_data = self.recorder.stop()
+            # Segments identified incrementally while recording; None means
+            # the stream didn't run and filter_silence does a batch pass
+            stream_timestamps = self.silence_filter.take_stream_timestamps()
             print(">>> PROCESSING...")
-            
+
             if audio_data is not None:
                 # Check minimum recording duration
                 duration = get_duration(audio_data, self.recorder.sample_rate)
@@ -79,7 +87,8 @@ class LocalWhisperCLI:
                 try:
                     filtered_audio = self.silence_filter.filter_silence(
                         audio_data,
-                        sample_rate=self.recorder.sample_rate
+                        sample_rate=self.recorder.sample_rate,
+                        timestamps=stream_timestamps
                     )
                 except Exception as e:
                     logger.error(f"Error during silence filtering: {e}")
@@ -90,28 +99,24 @@ class LocalWhisperCLI:
                     print(">>> No speech detected in recording. Skipping transcription.")
                     return
                 
-                # Save filtered audio to temp file
-                temp_file = self.recorder.save_wav(filtered_audio)
-                
                 try:
+                    # Pass the array directly to faster-whisper; the
+                    # transcriber scales int16 buffers itself, so no WAV
+                    # round-trip is needed.
                     text = self.transcriber.transcribe(
-                        temp_file,
+                        np.ascontiguousarray(filtered_audio),
                         language=self.config.get("language")
                     )
-                    
+
                     if text and text.strip():
                         print(f">>> TRANSCRIPTION: {text}")
                         self.keyboard.inject_text(text, mode=self.config.get("paste_mode", "type"))
                     else:
                         print(">>> No transcription generated.")
-                        
+
                 except Exception as e:
                     logger.error(f"Error during transcription: {e}")
                     print(f">>> Error during transcription: {e}")
-                finally:
-                    # Clean up
-                    if os.path.exists(temp_file):
-                        os.remove(temp_file)
             else:
                 print(">>> No audio captured.")
 
@@ -121,12 +126,13 @@ class LocalWhisperCLI:
         print("Press Ctrl+C to exit.")
         self.keyboard.start()
         try:
-            while True:
-                # On Windows, a short sleep in a loop is often more reliable
-                # for catching KeyboardInterrupt than join()
-                time.sleep(0.5)
-                if not self.keyboard.listener.running:
-                    break
+            # Wait until the listener stops; the event is set by
+            # KeyboardHandler when the listener thread ends. The wait must
+            # be timed: on Windows an untimed Event.wait() on the main
+            # thread blocks Ctrl+C, while timed waits return to bytecode
+            # where the pending KeyboardInterrupt is raised.
+            while not self._stop_event.wait(0.5):
+                pass
         except (KeyboardInterrupt, SystemExit):
             print("\nExiting...")
         finally:
@@ -135,5 +141,8 @@ class LocalWhisperCLI:
             os._exit(0)
 
 if __name__ == "__main__":
+    # Heavy ML imports happen inside Transcriber/SilenceFilter, so this
+    # prints immediately on launch
+    print("Starting Local Whisper CLI (loading models)...")
     cli = LocalWhisperCLI()
     cli.run()
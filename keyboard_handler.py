@@ -1,11 +1,13 @@
 from pynput import keyboard
+import threading
 import time
 
 class KeyboardHandler:
-    def __init__(self, hotkey_name, on_toggle_callback):
+    def __init__(self, hotkey_name, on_toggle_callback, on_stop_callback=None):
         self.controller = keyboard.Controller()
         self.hotkey_name = hotkey_name
         self.on_toggle_callback = on_toggle_callback
+        self.on_stop_callback = on_stop_callback
         self.target_key = self._parse_key(hotkey_name)
         self.listener = None
 
@@ -24,6 +26,14 @@ class KeyboardHandler:
     def start(self):
         self.listener = keyboard.Listener(on_press=self._on_press)
         self.listener.start()
+        if self.on_stop_callback:
+            # Fire the callback whenever the listener thread ends, whether
+            # via stop() or because the listener died on its own
+            threading.Thread(target=self._watch_listener, daemon=True).start()
+
+    def _watch_listener(self):
+        self.listener.join()
+        self.on_stop_callback()
 
     def stop(self):
         if self.listener:
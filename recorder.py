@@ -1,26 +1,46 @@
 import sounddevice as sd
 import numpy as np
-import scipy.io.wavfile as wav
 import threading
 import queue
-import os
 
 class AudioRecorder:
-    def __init__(self, sample_rate=16000):
+    def __init__(self, sample_rate=16000, silence_filter=None):
         self.sample_rate = sample_rate
+        # Optional SilenceFilter fed incrementally from the stream callback
+        # so speech segments are known the moment recording stops
+        self.silence_filter = silence_filter
         self.recording = False
-        self.audio_data = []
+        # Preallocated mono buffer, grown exponentially. Blocks are written
+        # in place so stop() can return a slice without a final concat copy.
+        # Stored as int16 (half the bytes of float32); consumers convert to
+        # float32 as late as possible via audio_utils.int16_to_float32.
+        self._buf = np.empty(self.sample_rate * 30, dtype=np.int16)
+        self._n = 0
         self._stream = None
 
     def _callback(self, indata, frames, time, status):
         if status:
             print(f"Error in audio stream: {status}")
         if self.recording:
-            self.audio_data.append(indata.copy())
+            n = len(indata)
+            if self._n + n > len(self._buf):
+                grown = np.empty(max(len(self._buf) * 2, self._n + n), dtype=np.int16)
+                grown[:self._n] = self._buf[:self._n]
+                self._buf = grown
+            self._buf[self._n:self._n + n] = np.clip(
+                indata[:, 0] * 32767.0, -32768, 32767
+            ).astype(np.int16)
+            self._n += n
+            if self.silence_filter is not None:
+                self.silence_filter.feed(indata[:, 0])
 
     def start(self):
         print("Starting recording...")
-        self.audio_data = []
+        self._n = 0
+        if self.silence_filter is not None:
+            # Declined (no-op) when the rate isn't Silero's 16 kHz; the
+            # batch VAD pass then handles resampling after recording
+            self.silence_filter.start_stream(self.sample_rate)
         self.recording = True
         self._stream = sd.InputStream(samplerate=self.sample_rate, channels=1, callback=self._callback)
         self._stream.start()
@@ -31,17 +51,8 @@ class AudioRecorder:
         if self._stream:
             self._stream.stop()
             self._stream.close()
-        
-        if not self.audio_data:
-            return None
-            
-        return np.concatenate(self.audio_data, axis=0)
 
-    def save_wav(self, data, filename="temp_recording.wav"):
-        if data is None:
+        if self._n == 0:
             return None
-        # Ensure data is float32 for consistency, though sounddevice usually provides it
-        # wav.write expects int16 or float32.
-        # If it's float32, it should be in range [-1, 1]
-        wav.write(filename, self.sample_rate, data.astype(np.float32))
-        return os.path.abspath(filename)
+
+        return self._buf[:self._n]
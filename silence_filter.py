@@ -2,25 +2,39 @@
 
 import io
 import logging
+import os
+import urllib.request
+from fractions import Fraction
+
 import numpy as np
-import torch
-import torchaudio
+from scipy.signal import resample_poly
+
+from audio_utils import ensure_mono, int16_to_float32
 
 logger = logging.getLogger(__name__)
 
+SILERO_ONNX_URL = (
+    "https://raw.githubusercontent.com/snakers4/silero-vad/master/"
+    "src/silero_vad/data/silero_vad.onnx"
+)
+
 
 class SilenceFilter:
     """Silero VAD-based silence filtering implementation.
-    
-    Uses Silero VAD model with ONNX runtime for voice activity detection
-    and silence trimming from audio recordings.
+
+    Runs the Silero VAD ONNX model through a direct onnxruntime session
+    for voice activity detection and silence trimming from audio
+    recordings, with preallocated input/state buffers reused across
+    windows.
     """
-    
+
     SILERO_SAMPLE_RATE = 16000  # Silero VAD requires 16kHz
-    
+    WINDOW_SIZE = 512           # Samples per VAD window at 16kHz
+    CONTEXT_SIZE = 64           # Samples of left context the model expects
+
     def __init__(self, config=None):
         """Initialize the SilenceFilter with configuration.
-        
+
         Args:
             config: Dict with silence_filter configuration. If None, uses defaults.
         """
@@ -30,232 +44,457 @@ class SilenceFilter:
         self.min_speech_duration_ms = self.config.get("min_speech_duration_ms", 250)
         self.min_silence_duration_ms = self.config.get("min_silence_duration_ms", 300)
         self.padding_ms = self.config.get("padding_ms", 100)
-        
-        self.model = None
+
+        self.session = None
         self._model_loaded = False
-        
+        # Up/down resampling ratios cached by (orig_freq, new_freq) so the
+        # Fraction reduction happens once per device rate.
+        self._resample_ratios = {}
+        # Reusable buffers for the ONNX session: model input is
+        # [context | window], plus the recurrent state and sample rate
+        self._in_buf = np.zeros(self.CONTEXT_SIZE + self.WINDOW_SIZE, dtype=np.float32)
+        self._state = np.zeros((2, 1, 128), dtype=np.float32)
+        self._sr_input = np.array(self.SILERO_SAMPLE_RATE, dtype=np.int64)
+
+        # Streaming state: incoming blocks accumulate into _pending until a
+        # full window is available; see start_stream/feed
+        self._pending = np.zeros(self.WINDOW_SIZE, dtype=np.float32)
+        self._pending_n = 0
+        self._windows_done = 0
+        self._vad_state = None
+        self._stream_active = False
+
         if self.enabled:
             self._load_model()
-    
+
+    def _ensure_model_file(self):
+        """Return the local path of the Silero ONNX model, downloading once."""
+        model_dir = os.path.join(os.getcwd(), "models")
+        model_path = os.path.join(model_dir, "silero_vad.onnx")
+        if not os.path.exists(model_path):
+            os.makedirs(model_dir, exist_ok=True)
+            logger.info(f"Downloading Silero VAD model to {model_path}...")
+            urllib.request.urlretrieve(SILERO_ONNX_URL, model_path)
+        return model_path
+
     def _load_model(self):
-        """Load the Silero VAD model with ONNX runtime."""
+        """Create the ONNX Runtime session for the Silero VAD model."""
         try:
+            import onnxruntime as ort
+
             logger.info("Loading Silero VAD model...")
-            self.model, utils = torch.hub.load(
-                repo_or_dir="snakers4/silero-vad",
-                model="silero_vad",
-                onnx=True,
+            model_path = self._ensure_model_file()
+
+            # Single-threaded sequential execution: the model is tiny and
+            # per-window, so thread handoff would only add overhead
+            so = ort.SessionOptions()
+            so.intra_op_num_threads = 1
+            so.inter_op_num_threads = 1
+            so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+            so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+            self.session = ort.InferenceSession(
+                model_path,
+                sess_options=so,
+                providers=["CPUExecutionProvider"],
             )
-            
-            # Extract utility functions
-            self.get_speech_timestamps = utils[0]
-            self.save_audio = utils[1]
-            self.read_audio = utils[2]
-            self.VADIterator = utils[3]
-            self.collect_chunks = utils[4]
-            
+
             self._model_loaded = True
             logger.info("Silero VAD model loaded successfully")
+
+            # Warm up the ONNX session on a second of silence so the first
+            # real utterance doesn't pay the lazy-init cost
+            try:
+                self._get_speech_timestamps(
+                    np.zeros(self.SILERO_SAMPLE_RATE, dtype=np.float32)
+                )
+            except Exception as e:
+                logger.warning(f"VAD warmup failed: {e}")
         except Exception as e:
             logger.error(f"Failed to load Silero VAD model: {e}")
             self._model_loaded = False
             self.enabled = False
-    
+
+    def _stream_reset(self):
+        """Reset ONNX buffers, window accumulation, and hysteresis state."""
+        self._in_buf[:] = 0.0
+        self._state[:] = 0.0
+        self._pending_n = 0
+        self._windows_done = 0
+        self._vad_state = {
+            "triggered": False,
+            "temp_end": 0,
+            "current": None,
+            "speeches": [],
+        }
+
+    def _process_window(self, window_samples):
+        """Run the VAD on one full window and advance the hysteresis.
+
+        Args:
+            window_samples: exactly WINDOW_SIZE float32 samples at 16kHz
+        """
+        buf = self._in_buf
+        context = self.CONTEXT_SIZE
+        buf[context:] = window_samples
+
+        out, self._state = self.session.run(
+            None,
+            {"input": buf[np.newaxis, :], "state": self._state, "sr": self._sr_input},
+        )
+
+        # Carry the last 64 samples forward as context for the next window
+        buf[:context] = buf[self.WINDOW_SIZE:]
+
+        self._hysteresis_step(float(out[0, 0]), self._windows_done * self.WINDOW_SIZE)
+        self._windows_done += 1
+
+    def _hysteresis_step(self, prob, pos):
+        """Advance segment detection by one window probability.
+
+        Replicates the logic of Silero's get_speech_timestamps: a segment
+        opens when the probability crosses `threshold` and closes once it
+        stays below `threshold - 0.15` for min_silence_duration_ms.
+        Padding is applied later by filter_silence.
+
+        Args:
+            prob: speech probability for the window starting at `pos`
+            pos: sample index of the window start
+        """
+        sr = self.SILERO_SAMPLE_RATE
+        window = self.WINDOW_SIZE
+        neg_threshold = max(self.threshold - 0.15, 0.01)
+        min_speech_samples = sr * self.min_speech_duration_ms // 1000
+        min_silence_samples = sr * self.min_silence_duration_ms // 1000
+        st = self._vad_state
+
+        if prob >= self.threshold and st["temp_end"]:
+            st["temp_end"] = 0
+
+        if prob >= self.threshold and not st["triggered"]:
+            st["triggered"] = True
+            st["current"] = {"start": pos}
+            return
+
+        if prob < neg_threshold and st["triggered"]:
+            if not st["temp_end"]:
+                st["temp_end"] = pos + window
+            if (pos + window) - st["temp_end"] < min_silence_samples:
+                return
+            st["current"]["end"] = st["temp_end"]
+            if st["current"]["end"] - st["current"]["start"] > min_speech_samples:
+                st["speeches"].append(st["current"])
+            st["current"] = None
+            st["triggered"] = False
+            st["temp_end"] = 0
+
+    def _finish_stream(self, total_samples):
+        """Close any open segment and return the detected timestamps.
+
+        Args:
+            total_samples: total number of samples seen by the stream
+
+        Returns:
+            List of dicts with 'start' and 'end' sample indices,
+            in ascending start order
+        """
+        if self._pending_n:
+            tail = self._pending.copy()
+            tail[self._pending_n:] = 0.0
+            self._process_window(tail)
+
+        sr = self.SILERO_SAMPLE_RATE
+        min_speech_samples = sr * self.min_speech_duration_ms // 1000
+        st = self._vad_state
+        if st["triggered"] and st["current"] is not None:
+            st["current"]["end"] = total_samples
+            if st["current"]["end"] - st["current"]["start"] > min_speech_samples:
+                st["speeches"].append(st["current"])
+            st["current"] = None
+            st["triggered"] = False
+
+        return st["speeches"]
+
+    def start_stream(self, sample_rate):
+        """Begin incremental VAD; feed() then runs during recording.
+
+        Declines unless the recording rate is Silero's 16 kHz: streamed
+        windows are fed to the model unresampled and the resulting
+        timestamps index the 16 kHz array, so at any other rate the
+        batch pass (which resamples first) must run instead.
+
+        Args:
+            sample_rate: sample rate the recorder will feed at
+        """
+        if not self.enabled or not self._model_loaded:
+            return
+        if sample_rate != self.SILERO_SAMPLE_RATE:
+            logger.debug(
+                f"Streaming VAD requires {self.SILERO_SAMPLE_RATE}Hz input, "
+                f"got {sample_rate}Hz; falling back to batch pass"
+            )
+            return
+        self._stream_reset()
+        self._stream_active = True
+
+    def feed(self, samples):
+        """Feed a block of recorded audio through the streaming VAD.
+
+        Called from the audio callback: blocks of any size accumulate
+        into full 512-sample windows, so by the time recording stops the
+        speech segments are already identified and no second full-audio
+        VAD pass is needed.
+
+        Args:
+            samples: float32 numpy array of mono samples at 16kHz
+        """
+        if not self._stream_active:
+            return
+        try:
+            samples = np.asarray(samples, dtype=np.float32).ravel()
+            window = self.WINDOW_SIZE
+            i = 0
+            n = len(samples)
+            while i < n:
+                take = min(window - self._pending_n, n - i)
+                self._pending[self._pending_n:self._pending_n + take] = samples[i:i + take]
+                self._pending_n += take
+                i += take
+                if self._pending_n == window:
+                    self._process_window(self._pending)
+                    self._pending_n = 0
+        except Exception as e:
+            logger.error(f"Error in streaming VAD, falling back to batch pass: {e}")
+            self._stream_active = False
+
+    def take_stream_timestamps(self):
+        """Finalize the stream and return its speech timestamps.
+
+        Returns:
+            List of timestamp dicts, or None if no stream ran (disabled,
+            never started, or aborted after an error) — callers then fall
+            back to the batch VAD pass.
+        """
+        if not self._stream_active:
+            return None
+        self._stream_active = False
+        try:
+            total = self._windows_done * self.WINDOW_SIZE + self._pending_n
+            return self._finish_stream(total)
+        except Exception as e:
+            logger.error(f"Error finalizing streaming VAD: {e}")
+            return None
+
+    def _get_speech_timestamps(self, audio):
+        """Detect speech segments in a complete audio buffer.
+
+        Batch counterpart of the streaming API: runs the same windowing
+        and hysteresis over the whole array in one call.
+
+        Args:
+            audio: contiguous float32 numpy array at 16kHz
+
+        Returns:
+            List of dicts with 'start' and 'end' sample indices,
+            in ascending start order
+        """
+        self._stream_reset()
+        window = self.WINDOW_SIZE
+        for offset in range(0, len(audio), window):
+            chunk = audio[offset:offset + window]
+            if len(chunk) == window:
+                self._process_window(chunk)
+            else:
+                self._pending[:len(chunk)] = chunk
+                self._pending_n = len(chunk)
+        return self._finish_stream(len(audio))
+
     def _resample_if_needed(self, audio, sample_rate):
         """Resample audio to 16kHz if needed.
-        
+
         Args:
             audio: numpy array of audio data
             sample_rate: current sample rate
-            
+
         Returns:
             Tuple of (resampled audio, target sample rate)
         """
-        if sample_rate != self.SILERO_SAMPLE_RATE:
-            logger.debug(f"Resampling from {sample_rate}Hz to {self.SILERO_SAMPLE_RATE}Hz")
-            
-            # Convert numpy to torch tensor
-            if isinstance(audio, np.ndarray):
-                audio_tensor = torch.from_numpy(audio).float()
-            else:
-                audio_tensor = audio.float()
-            
-            # Ensure mono (1 channel)
-            if audio_tensor.dim() == 1:
-                audio_tensor = audio_tensor.unsqueeze(0)
-            elif audio_tensor.dim() == 2 and audio_tensor.shape[0] > 1:
-                audio_tensor = audio_tensor.mean(dim=0, keepdim=True)
-            elif audio_tensor.dim() == 2 and audio_tensor.shape[1] > 1:
-                audio_tensor = audio_tensor.mean(dim=1, keepdim=True)
-            
-            # Resample
-            resampler = torchaudio.transforms.Resample(
-                orig_freq=sample_rate,
-                new_freq=self.SILERO_SAMPLE_RATE
+        # Fast path: the recorder already captures at 16 kHz, so this is
+        # normally a no-op.
+        if sample_rate == self.SILERO_SAMPLE_RATE:
+            return audio, sample_rate
+
+        logger.debug(f"Resampling from {sample_rate}Hz to {self.SILERO_SAMPLE_RATE}Hz")
+
+        # Polyphase FIR resampling with a cached up/down ratio; resample_poly
+        # runs in C and needs no tensor round-trip
+        key = (sample_rate, self.SILERO_SAMPLE_RATE)
+        ratio = self._resample_ratios.get(key)
+        if ratio is None:
+            frac = Fraction(self.SILERO_SAMPLE_RATE, sample_rate).limit_denominator(1000)
+            ratio = self._resample_ratios.setdefault(
+                key, (frac.numerator, frac.denominator)
             )
-            audio_resampled = resampler(audio_tensor)
-            
-            # Convert back to numpy
-            return audio_resampled.squeeze().numpy(), self.SILERO_SAMPLE_RATE
-        
-        return audio, sample_rate
-    
+        up, down = ratio
+        audio_resampled = resample_poly(audio, up, down)
+
+        return audio_resampled.astype(np.float32, copy=False), self.SILERO_SAMPLE_RATE
+
     def _prepare_audio_for_vad(self, audio, sample_rate):
         """Prepare audio for VAD processing.
-        
+
         Args:
             audio: numpy array of audio data
             sample_rate: current sample rate
-            
+
         Returns:
-            Tuple of (prepared torch tensor, effective sample rate)
+            Tuple of (contiguous float32 mono numpy array, effective sample rate)
         """
-        # Resample if needed
+        # Single canonical chain: float32 -> mono -> 16 kHz -> contiguous,
+        # each step a no-op on the recorder's native int16 mono 16 kHz input
+        if not isinstance(audio, np.ndarray):
+            audio = audio.numpy()
+
+        # Recorder stores int16; convert to float32 only here, at VAD
+        # input, and before ensure_mono so downmixing runs on float data
+        if audio.dtype == np.int16:
+            audio = int16_to_float32(audio)
+
+        audio = ensure_mono(audio)
+
+        # Resample if needed (expects mono)
         audio, effective_sr = self._resample_if_needed(audio, sample_rate)
-        
-        # Convert to torch tensor
-        if isinstance(audio, np.ndarray):
-            audio_tensor = torch.from_numpy(audio).float()
-        else:
-            audio_tensor = audio.float()
-        
-        # Ensure 1D tensor
-        if audio_tensor.dim() > 1:
-            audio_tensor = audio_tensor.squeeze()
-        
-        return audio_tensor, effective_sr
-    
+
+        return np.ascontiguousarray(audio, dtype=np.float32), effective_sr
+
     def has_speech(self, audio, sample_rate=16000):
         """Check if audio contains speech.
-        
+
         Args:
             audio: numpy array of audio data
             sample_rate: sample rate of the audio
-            
+
         Returns:
             Boolean indicating if speech was detected
         """
         if not self.enabled or not self._model_loaded:
             logger.debug("VAD disabled or model not loaded, assuming speech present")
             return True
-        
+
         try:
-            audio_tensor, effective_sr = self._prepare_audio_for_vad(audio, sample_rate)
-            
-            if len(audio_tensor) == 0:
+            audio, effective_sr = self._prepare_audio_for_vad(audio, sample_rate)
+
+            if len(audio) == 0:
                 return False
-            
+
             # Get speech timestamps
-            speech_timestamps = self.get_speech_timestamps(
-                audio_tensor,
-                self.model,
-                threshold=self.threshold,
-                min_speech_duration_ms=self.min_speech_duration_ms,
-                min_silence_duration_ms=self.min_silence_duration_ms,
-            )
-            
+            speech_timestamps = self._get_speech_timestamps(audio)
+
             return len(speech_timestamps) > 0
-            
+
         except Exception as e:
             logger.error(f"Error in has_speech check: {e}")
             return True  # Assume speech on error to avoid losing data
-    
-    def filter_silence(self, audio, sample_rate=16000):
+
+    def filter_silence(self, audio, sample_rate=16000, timestamps=None):
         """Filter silence from audio, keeping only speech segments.
-        
+
         Args:
             audio: numpy array of audio data
             sample_rate: sample rate of the audio
-            
+            timestamps: optional precomputed speech timestamps from the
+                streaming VAD; when None, a batch VAD pass runs here
+
         Returns:
             Filtered audio as numpy array (may be empty if no speech)
         """
         if not self.enabled or not self._model_loaded:
             logger.debug("VAD disabled or model not loaded, returning original audio")
             return audio
-        
+
         try:
-            audio_tensor, effective_sr = self._prepare_audio_for_vad(audio, sample_rate)
-            
-            if len(audio_tensor) == 0:
+            audio, effective_sr = self._prepare_audio_for_vad(audio, sample_rate)
+
+            if len(audio) == 0:
                 logger.debug("Empty audio provided")
                 return np.array([], dtype=np.float32)
-            
-            logger.debug("Detecting speech segments...")
-            
-            # Get speech timestamps with padding
-            speech_timestamps = self.get_speech_timestamps(
-                audio_tensor,
-                self.model,
-                threshold=self.threshold,
-                min_speech_duration_ms=self.min_speech_duration_ms,
-                min_silence_duration_ms=self.min_silence_duration_ms,
-            )
-            
+
+            # Use timestamps already gathered during recording when
+            # available; otherwise run the batch VAD pass now
+            if timestamps is not None:
+                logger.debug("Using streamed speech segments")
+                speech_timestamps = timestamps
+            else:
+                logger.debug("Detecting speech segments...")
+                speech_timestamps = self._get_speech_timestamps(audio)
+
             if not speech_timestamps:
                 logger.info("No speech detected in audio")
                 return np.array([], dtype=np.float32)
-            
+
             # Apply padding to timestamps
             padding_samples = int(self.padding_ms * effective_sr / 1000)
             for ts in speech_timestamps:
                 ts["start"] = max(0, ts["start"] - padding_samples)
-                ts["end"] = min(len(audio_tensor), ts["end"] + padding_samples)
-            
+                ts["end"] = min(len(audio), ts["end"] + padding_samples)
+
             # Merge overlapping timestamps
             merged_timestamps = self._merge_timestamps(speech_timestamps)
-            
+
             # Collect speech chunks
             speech_chunks = []
             for ts in merged_timestamps:
                 start = ts["start"]
                 end = ts["end"]
-                speech_chunks.append(audio_tensor[start:end])
-            
+                speech_chunks.append(audio[start:end])
+
             if not speech_chunks:
                 logger.info("No valid speech segments after processing")
                 return np.array([], dtype=np.float32)
-            
+
             # Concatenate all speech chunks
-            filtered_audio = torch.cat(speech_chunks)
-            
+            filtered_audio = np.concatenate(speech_chunks)
+
             logger.info(
                 f"Filtered audio: {len(speech_timestamps)} speech segments, "
-                f"original: {len(audio_tensor)/effective_sr:.2f}s, "
+                f"original: {len(audio)/effective_sr:.2f}s, "
                 f"filtered: {len(filtered_audio)/effective_sr:.2f}s"
             )
-            
-            return filtered_audio.numpy()
-            
+
+            return filtered_audio
+
         except Exception as e:
             logger.error(f"Error filtering silence: {e}")
             logger.warning("Returning original audio due to filtering error")
             return audio
-    
+
     def _merge_timestamps(self, timestamps):
         """Merge overlapping or adjacent timestamps.
-        
+
         Args:
             timestamps: List of dicts with 'start' and 'end' keys
-            
+
         Returns:
             List of merged timestamps
         """
         if not timestamps:
             return []
-        
-        # Sort by start time
-        sorted_ts = sorted(timestamps, key=lambda x: x["start"])
-        
-        merged = [sorted_ts[0]]
-        for current in sorted_ts[1:]:
+
+        # _get_speech_timestamps returns segments in ascending start
+        # order, so a single merge pass suffices
+        if __debug__:
+            for prev, cur in zip(timestamps, timestamps[1:]):
+                assert cur["start"] >= prev["start"], "timestamps not sorted"
+
+        merged = [timestamps[0]]
+        for current in timestamps[1:]:
             last = merged[-1]
-            
+
             # Check if current overlaps or is adjacent to last
             if current["start"] <= last["end"]:
                 # Merge by extending the end time
                 last["end"] = max(last["end"], current["end"])
             else:
                 merged.append(current)
-        
+
         return merged
@@ -1,9 +1,13 @@
-from faster_whisper import WhisperModel
+import numpy as np
 import os
 from pathlib import Path
-import torch
 import logging
 
+from audio_utils import int16_to_float32
+
+# torch and faster_whisper are imported lazily in __init__: they cost
+# 1-2 s on cold start and shouldn't delay CLI startup.
+
 logger = logging.getLogger(__name__)
 
 REQUIRED_MODEL_FILES = (
@@ -16,7 +20,11 @@ REQUIRED_MODEL_FILES = (
 
 
 class Transcriber:
-    def __init__(self, model_size="turbo", device=None, transcription_config=None):
+    def __init__(self, model_size="turbo", device=None, compute_type=None,
+                 transcription_config=None):
+        import torch
+        from faster_whisper import WhisperModel
+
         # Check if CUDA is available and requested
         if device == "cuda" and not torch.cuda.is_available():
             print("Warning: CUDA requested but not available. Falling back to CPU.")
@@ -41,16 +49,21 @@ class Transcriber:
         print(f"Loading Faster-Whisper model '{model_name}' on {device}...")
         
         # compute_type optimization:
-        # CUDA: float16 is much faster and uses less VRAM.
-        # CPU: int8 is faster than float32.
-        compute_type = "float16" if device == "cuda" else "int8"
-        
+        # CUDA: int8_float16 (int8 weights, fp16 activations) halves VRAM
+        #       vs. float16 and uses int8 tensor-core MMA for the encoder.
+        # CPU: int8 is faster than float32 (VNNI/AMX dispatch where available).
+        # Overridable via config for hardware where int8 misbehaves.
+        if compute_type is None:
+            compute_type = "int8_float16" if device == "cuda" else "int8"
+
         try:
             self.model = WhisperModel(
                 model_name,
                 device=device,
                 compute_type=compute_type,
-                download_root=str(download_root)
+                download_root=str(download_root),
+                cpu_threads=os.cpu_count(),
+                num_workers=1
             )
         except Exception as e:
             print(f"Warning: Could not initialize model on {device}: {e}")
@@ -60,7 +73,9 @@ class Transcriber:
                     model_name,
                     device="cpu",
                     compute_type="int8",
-                    download_root=str(download_root)
+                    download_root=str(download_root),
+                    cpu_threads=os.cpu_count(),
+                    num_workers=1
                 )
             else:
                 raise e
@@ -70,6 +85,24 @@ class Transcriber:
         self.filter_no_speech = self.transcription_config.get("filter_no_speech", True)
         self.no_speech_threshold = self.transcription_config.get("no_speech_threshold", 0.6)
 
+        self._warmup()
+
+    def _warmup(self):
+        """Run a throwaway inference so kernel init happens at startup.
+
+        The first transcribe call otherwise pays for cuBLAS handle
+        creation and CTranslate2 kernel selection, showing up as a
+        latency spike on the first utterance.
+        """
+        try:
+            logger.info("Warming up Faster-Whisper model...")
+            segments, _ = self.model.transcribe(
+                np.zeros(16000, dtype=np.float32), beam_size=1, language="en"
+            )
+            list(segments)
+        except Exception as e:
+            logger.warning(f"Model warmup failed: {e}")
+
     def _find_complete_cached_snapshot(self, model_name, download_root):
         """Return a complete Hugging Face cache snapshot when one is already present."""
         if os.path.isdir(model_name) or "/" not in model_name:
@@ -111,45 +144,58 @@ class Transcriber:
             key=lambda snapshot: (snapshot / "model.bin").stat().st_mtime,
         )
 
-    def transcribe(self, audio_path, language=None):
-        if not os.path.exists(audio_path):
-            logger.warning(f"Audio file does not exist: {audio_path}")
-            return ""
-        
-        logger.info(f"Transcribing {audio_path}...")
-        # beam_size=1 is much faster for local CPU usage
-        segments, info = self.model.transcribe(audio_path, beam_size=1, language=language)
-        
-        # Convert generator to list to allow multiple iterations
-        segments_list = list(segments)
+    def transcribe(self, audio, language=None):
+        # audio can be a file path or a float32 mono numpy array at 16 kHz.
+        # Passing the array directly skips the WAV encode/decode round-trip.
+        if isinstance(audio, str):
+            if not os.path.exists(audio):
+                logger.warning(f"Audio file does not exist: {audio}")
+                return ""
+            logger.info(f"Transcribing {audio}...")
+        else:
+            # int16 buffers from the recorder are scaled to float32 here,
+            # as late as possible
+            if audio.dtype == np.int16:
+                audio = int16_to_float32(audio)
+            logger.info(f"Transcribing in-memory audio ({len(audio)} samples)...")
+
+        # beam_size=1 is much faster for local CPU usage.
+        # vad_filter stays off: SilenceFilter already trimmed the audio,
+        # so faster-whisper's internal VAD would just re-scan it.
+        segments, info = self.model.transcribe(
+            audio, beam_size=1, language=language, vad_filter=False
+        )
         
-        if not segments_list:
+        # Stream the segment generator: filter and collect text on the fly
+        # instead of materializing every Segment object up front
+        parts = []
+        kept_count = 0
+        removed_count = 0
+
+        for segment in segments:
+            if (
+                self.filter_no_speech
+                and getattr(segment, "no_speech_prob", 0) >= self.no_speech_threshold
+            ):
+                removed_count += 1
+                logger.debug(
+                    f"Filtering segment with high no_speech_prob: "
+                    f"{segment.no_speech_prob:.2f} >= {self.no_speech_threshold}"
+                )
+                continue
+            parts.append(segment.text)
+            kept_count += 1
+
+        if removed_count > 0:
+            logger.info(f"Filtered {removed_count} segments with no_speech_prob >= {self.no_speech_threshold}")
+
+        if not kept_count:
             logger.info("No segments found in audio")
             return ""
-        
-        # Filter segments based on no_speech_prob if enabled
-        if self.filter_no_speech:
-            filtered_segments = []
-            removed_count = 0
-            
-            for segment in segments_list:
-                if hasattr(segment, 'no_speech_prob') and segment.no_speech_prob >= self.no_speech_threshold:
-                    removed_count += 1
-                    logger.debug(
-                        f"Filtering segment with high no_speech_prob: "
-                        f"{segment.no_speech_prob:.2f} >= {self.no_speech_threshold}"
-                    )
-                    continue
-                filtered_segments.append(segment)
-            
-            if removed_count > 0:
-                logger.info(f"Filtered {removed_count} segments with no_speech_prob >= {self.no_speech_threshold}")
-            
-            segments_list = filtered_segments
-        
+
         # Concatenate remaining segments for final text
-        text = "".join([segment.text for segment in segments_list])
-        
-        logger.info(f"Transcription completed: {len(text)} characters from {len(segments_list)} segments")
-        
+        text = "".join(parts)
+
+        logger.info(f"Transcription completed: {len(text)} characters from {kept_count} segments")
+
         return text.strip()